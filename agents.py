@@ -1,11 +1,26 @@
 """AI Ops Desk Agent Modules
 
-Each agent is a pure function that takes a WorkflowPayload,
-enriches it, and returns the updated payload plus a log dict.
+Each agent is a coroutine that takes a WorkflowPayload (plus the shared
+HTTP client for agents that call connectors), enriches it, and returns
+the updated payload plus a log dict. Agents await their connector and
+LLM calls, so the event loop serves other workflows while they wait and
+independent lookups within an agent overlap. Agent bodies are wrapped by @agent: a body
+takes the same arguments as the agent and returns its log fields, and
+the wrapper adds the agent name and status (turning exceptions into a
+"failed" entry).
 """
 
-from typing import Tuple, Dict, Any
-from datetime import datetime
+from typing import Tuple, Dict, Any, AsyncIterator, List, Callable, Awaitable, Optional
+from contextlib import aclosing
+import asyncio
+import functools
+import httpx
+import msgspec
+from cache import SemanticCache
+from connectors.calendar import find_calendar_slots
+from connectors.gmail import fetch_gmail_thread
+from triage_rules import classify_by_rules
+from qa_scoring import score_qa_risk, StreamingRiskMonitor, ESCALATION_RISK
 from schemas import (
     WorkflowPayload,
     Intent,
@@ -18,171 +33,296 @@ from schemas import (
 # Type alias for agent return value
 AgentOutput = Tuple[WorkflowPayload, Dict[str, Any]]
 
+# Agent as called by the orchestrator, and the body wrapped by @agent
+Agent = Callable[..., Awaitable[AgentOutput]]
+AgentBody = Callable[..., Awaitable[Dict[str, Any]]]
 
-def ingestion_agent(payload: WorkflowPayload) -> AgentOutput:
+# Shared semantic cache for LLM/KB results (None when REDIS_URL is unset)
+semantic_cache = SemanticCache.from_env()
+
+# Intents answered together in one reply by combined_worker_agent
+COMBINED_INTENTS = frozenset({Intent.SCHEDULING, Intent.SUPPORT})
+
+
+def agent(name: str) -> Callable[[AgentBody], Agent]:
+    """
+    Decorate an agent body that mutates the payload and returns its log fields.
+
+    The wrapped agent is called with the body's own arguments and returns
+    (payload, log). The log status is "completed", "skipped" if the body
+    returned skipped=True, or "failed" with the error if the body raised.
+    """
+    def decorate(body: AgentBody) -> Agent:
+        @functools.wraps(body)
+        async def run(payload: WorkflowPayload, *args) -> AgentOutput:
+            log = {"agent": name, "status": "pending"}
+            try:
+                log.update(await body(payload, *args))
+                log["status"] = "skipped" if log.get("skipped") else "completed"
+            except Exception as e:
+                log["status"] = "failed"
+                log["error"] = str(e)
+            return payload, log
+        return run
+    return decorate
+
+
+async def stream_placeholder(text: str) -> AsyncIterator[str]:
+    """Yield canned reply text word by word, standing in for an LLM stream."""
+    for word in text.split(" "):
+        yield word + " "
+
+
+async def draft_with_qa(
+    payload: WorkflowPayload,
+    chunks: AsyncIterator[str],
+    log: Dict[str, Any]
+) -> Optional[str]:
+    """
+    Consume a streamed draft while scoring its risk.
+
+    Returns the draft, or None when it was cancelled because it already
+    needs escalation; a cancelled draft must not be planned as a reply.
+    """
+    confidence = payload.classification.confidence if payload.classification else 0.0
+    monitor = StreamingRiskMonitor(confidence)
+    
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            monitor.feed(chunk)
+            if monitor.should_escalate:
+                log["draft_stopped_early"] = True
+                payload.draft_risk_score = monitor.risk
+                return None
+    
+    payload.draft_risk_score = monitor.finish()
+    return monitor.text.strip()
+
+
+@agent("ingestion")
+async def ingestion_agent(payload: WorkflowPayload, http: httpx.AsyncClient) -> Dict[str, Any]:
     """Normalize incoming message and fetch thread history."""
-    log = {"agent": "ingestion", "status": "pending"}
-    
-    try:
-        # Fetch thread history from Gmail
-        # TODO: Implement fetch_gmail_thread connector
-        # thread_history = fetch_gmail_thread(
-        #     payload.source["thread_id"],
-        #     payload.tenant_config.tenant_id
-        # )
-        # payload.thread_history = thread_history
-        
-        log["status"] = "completed"
-        log["messages_fetched"] = len(payload.thread_history.messages)
-    except Exception as e:
-        log["status"] = "failed"
-        log["error"] = str(e)
+    log: Dict[str, Any] = {}
+    
+    # Fetch thread history from Gmail
+    payload.thread_history = await fetch_gmail_thread(
+        http,
+        payload.source["thread_id"],
+        payload.tenant_id
+    )
     
-    payload.updated_at = datetime.utcnow()
-    return payload, log
+    log["messages_fetched"] = len(payload.thread_history.messages)
+    
+    return log
 
 
-def triage_agent(payload: WorkflowPayload) -> AgentOutput:
+@agent("triage")
+async def triage_agent(payload: WorkflowPayload) -> Dict[str, Any]:
     """Classify intent and priority."""
-    log = {"agent": "triage", "status": "pending"}
+    log: Dict[str, Any] = {}
+    
+    body_text = payload.message.body_text
+    namespace = f"triage:{payload.tenant_id}"
     
-    try:
+    # Cheapest first: keyword rules, then semantic cache, then LLM
+    classification = classify_by_rules(payload.message.subject, body_text)
+    cached = None
+    if classification is None and semantic_cache:
+        cached = await semantic_cache.lookup(body_text, namespace=namespace)
+    
+    if classification:
+        log["rule_match"] = True
+    elif cached:
+        classification = msgspec.convert(cached, Classification)
+        log["cache_hit"] = True
+    else:
         # TODO: Implement call_llm_triage with actual LLM integration
-        # classification = call_llm_triage(
+        # classification = await call_llm_triage(
         #     payload.message,
         #     payload.thread_history,
         #     payload.tenant_config
         # )
+        # if semantic_cache:
+        #     await semantic_cache.store(
+        #         body_text,
+        #         msgspec.to_builtins(classification),
+        #         namespace=namespace
+        #     )
         
-        # Placeholder classification
+        # Placeholder classification (the LLM reports every intent it finds); never cached
         classification = Classification(
             intent=Intent.SCHEDULING,
+            intents=[Intent.SCHEDULING],
             confidence=0.85,
             priority=Priority.NORMAL
         )
-        
-        payload.classification = classification
-        log["intent"] = classification.intent.value
-        log["confidence"] = classification.confidence
-        log["status"] = "completed"
-    except Exception as e:
-        log["status"] = "failed"
-        log["error"] = str(e)
     
-    payload.updated_at = datetime.utcnow()
-    return payload, log
+    if not classification.intents:
+        classification.intents = [classification.intent]
+    
+    payload.classification = classification
+    log["intent"] = classification.intent.value
+    log["intents"] = [intent.value for intent in classification.intents]
+    log["confidence"] = classification.confidence
+    
+    return log
 
 
-def admin_scheduling_agent(payload: WorkflowPayload) -> AgentOutput:
+@agent("admin_scheduling")
+async def admin_scheduling_agent(payload: WorkflowPayload, http: httpx.AsyncClient) -> Dict[str, Any]:
     """For scheduling intents, propose times and draft reply."""
-    log = {"agent": "admin_scheduling", "status": "pending"}
-    
     # Only run if intent is scheduling
     if payload.classification.intent != Intent.SCHEDULING:
-        log["skipped"] = True
-        return payload, log
-    
-    try:
-        # TODO: Implement find_calendar_slots and draft_scheduling_reply
-        # slots = find_calendar_slots(
-        #     payload.tenant_config,
-        #     num_slots=3
-        # )
-        # reply_text = draft_scheduling_reply(
-        #     payload.contact.name,
-        #     slots,
-        #     payload.tenant_config.tone
-        # )
-        
-        # Placeholder
-        reply_text = "Thank you for reaching out. Here are some available times..."
-        
+        return {"skipped": True}
+    
+    log: Dict[str, Any] = {}
+    
+    slots = await find_calendar_slots(http, payload.tenant_config, num_slots=3)
+    
+    # TODO: Implement draft_scheduling_reply
+    # chunks = draft_scheduling_reply(  # streams LLM output
+    #     payload.contact.name,
+    #     slots,
+    #     payload.tenant_config.tone
+    # )
+    
+    # Placeholder
+    chunks = stream_placeholder("Thank you for reaching out. Here are some available times...")
+    reply_text = await draft_with_qa(payload, chunks, log)
+    
+    if reply_text is not None:
         action = Action(
             action_type="reply",
             tool_name="gmail",
             tool_args={"body": reply_text}
         )
         payload.action_plan.append(action)
-        
-        log["slots_proposed"] = 3
-        log["status"] = "completed"
-    except Exception as e:
-        log["status"] = "failed"
-        log["error"] = str(e)
     
-    payload.updated_at = datetime.utcnow()
-    return payload, log
+    log["slots_proposed"] = len(slots)
+    
+    return log
 
 
-def support_faq_agent(payload: WorkflowPayload) -> AgentOutput:
+@agent("support_faq")
+async def support_faq_agent(payload: WorkflowPayload, http: httpx.AsyncClient) -> Dict[str, Any]:
     """For support intents, look up KB and draft answer."""
-    log = {"agent": "support_faq", "status": "pending"}
-    
     if payload.classification.intent != Intent.SUPPORT:
-        log["skipped"] = True
-        return payload, log
+        return {"skipped": True}
     
-    try:
-        # TODO: Implement search_kb and draft_support_answer
-        # kb_matches = search_kb(payload.message.body_text, top_k=2)
-        # reply_text = draft_support_answer(
-        #     payload.message,
-        #     kb_matches,
-        #     payload.tenant_config.tone
-        # )
-        
-        reply_text = "Based on your question, here is the information..."
-        
+    log: Dict[str, Any] = {}
+    
+    kb_matches = await _search_kb(payload, log)
+    
+    # TODO: Implement draft_support_answer
+    # chunks = draft_support_answer(  # streams LLM output
+    #     payload.message,
+    #     kb_matches,
+    #     payload.tenant_config.tone
+    # )
+    
+    chunks = stream_placeholder("Based on your question, here is the information...")
+    reply_text = await draft_with_qa(payload, chunks, log)
+    
+    if reply_text is not None:
         action = Action(
             action_type="reply",
             tool_name="gmail",
             tool_args={"body": reply_text}
         )
         payload.action_plan.append(action)
-        
-        log["kb_matches"] = 2
-        log["status"] = "completed"
-    except Exception as e:
-        log["status"] = "failed"
-        log["error"] = str(e)
     
-    payload.updated_at = datetime.utcnow()
-    return payload, log
+    log["kb_matches"] = len(kb_matches)
+    
+    return log
 
 
-def qa_guardrail_agent(payload: WorkflowPayload) -> AgentOutput:
+@agent("combined_worker")
+async def combined_worker_agent(payload: WorkflowPayload, http: httpx.AsyncClient) -> Dict[str, Any]:
+    """For scheduling + support messages, find slots and search KB concurrently, then draft one reply."""
+    if not COMBINED_INTENTS <= set(payload.classification.intents):
+        return {"skipped": True}
+    
+    log: Dict[str, Any] = {}
+    
+    # Independent lookups: calendar free/busy and KB search overlap
+    slots, kb_matches = await asyncio.gather(
+        find_calendar_slots(http, payload.tenant_config, num_slots=3),
+        _search_kb(payload, log)
+    )
+    
+    # TODO: Implement draft_combined_reply
+    # chunks = draft_combined_reply(  # streams LLM output
+    #     payload.message,
+    #     slots,
+    #     kb_matches,
+    #     payload.tenant_config.tone
+    # )
+    
+    chunks = stream_placeholder(
+        "Thank you for reaching out. Here is the information you asked for, and some available times..."
+    )
+    reply_text = await draft_with_qa(payload, chunks, log)
+    
+    if reply_text is not None:
+        action = Action(
+            action_type="reply",
+            tool_name="gmail",
+            tool_args={"body": reply_text}
+        )
+        payload.action_plan.append(action)
+    
+    log["slots_proposed"] = len(slots)
+    log["kb_matches"] = len(kb_matches)
+    
+    return log
+
+
+async def _search_kb(payload: WorkflowPayload, log: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Search the knowledge base for the message, via the semantic cache."""
+    body_text = payload.message.body_text
+    namespace = f"kb:{payload.tenant_id}"
+    kb_matches = None
+    if semantic_cache:
+        kb_matches = await semantic_cache.lookup(body_text, namespace=namespace)
+    
+    if kb_matches is None:
+        # TODO: Implement search_kb
+        # kb_matches = await search_kb(payload.message.body_text, top_k=2)
+        # if semantic_cache:
+        #     await semantic_cache.store(body_text, kb_matches, namespace=namespace)
+        kb_matches = []  # placeholder; never cached
+    else:
+        log["cache_hit"] = True
+    
+    return kb_matches
+
+
+@agent("qa_guardrail")
+async def qa_guardrail_agent(payload: WorkflowPayload) -> Dict[str, Any]:
     """Evaluate risk and decide auto_send vs draft vs escalate."""
-    log = {"agent": "qa_guardrail", "status": "pending"}
+    log: Dict[str, Any] = {}
     
-    try:
-        # TODO: Implement score_qa_risk with actual risk scoring
-        # risk_score = score_qa_risk(payload, payload.tenant_config)
-        
-        # Placeholder risk scoring
-        risk_score = 0.2
-        payload.qa_risk_score = risk_score
-        
-        # Decide based on intent, confidence, risk, and tenant config
-        if (
-            payload.classification.confidence < payload.tenant_config.escalation_threshold
-            or risk_score > 0.7
-        ):
-            payload.qa_decision = QADecision.ESCALATE
-        elif (
-            payload.tenant_config.auto_send_enabled
-            and risk_score < 0.3
-            and payload.classification.confidence > 0.85
-        ):
-            payload.qa_decision = QADecision.AUTO_SEND
-        else:
-            payload.qa_decision = QADecision.DRAFT_ONLY
-        
-        log["risk_score"] = risk_score
-        log["decision"] = payload.qa_decision.value
-        log["status"] = "completed"
-    except Exception as e:
-        log["status"] = "failed"
-        log["error"] = str(e)
-    
-    payload.updated_at = datetime.utcnow()
-    return payload, log
+    # Inbound message risk, raised by any risk found while drafting
+    risk_score = max(score_qa_risk(payload), payload.draft_risk_score or 0.0)
+    payload.qa_risk_score = risk_score
+    
+    # Decide based on intent, confidence, risk, and tenant config; only a planned reply can be auto-sent
+    if (
+        payload.classification.confidence < payload.tenant_config.escalation_threshold
+        or risk_score > ESCALATION_RISK
+    ):
+        payload.qa_decision = QADecision.ESCALATE
+    elif (
+        payload.tenant_config.auto_send_enabled
+        and any(action.action_type == "reply" for action in payload.action_plan)
+        and risk_score < 0.3
+        and payload.classification.confidence > 0.85
+    ):
+        payload.qa_decision = QADecision.AUTO_SEND
+    else:
+        payload.qa_decision = QADecision.DRAFT_ONLY
+    
+    log["risk_score"] = risk_score
+    log["decision"] = payload.qa_decision.value
+    
+    return log
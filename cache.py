@@ -0,0 +1,196 @@
+"""Semantic cache for LLM and knowledge-base lookups
+
+Results are stored in Redis next to an embedding of the input text. A
+lookup runs a KNN query against a RediSearch HNSW index and returns the
+cached value when the nearest entry in the same namespace is within the
+cosine-distance threshold, so near-duplicate emails skip the LLM call.
+Any failure (Redis or the embedder) is treated as a miss, so the cache
+can slow a workflow down by at most EMBEDDING_TIMEOUT but never fail it.
+"""
+
+from typing import Any, Awaitable, Callable, List, Optional
+from collections import OrderedDict
+import array
+import asyncio
+import os
+import uuid
+
+import orjson
+import redis.asyncio as redis
+from redis.commands.search.field import TagField, VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+# Async callable turning text into an embedding vector
+Embedder = Callable[[str], Awaitable[List[float]]]
+
+INDEX_NAME = "idx:semantic_cache"
+KEY_PREFIX = "semcache:"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
+
+# Seconds to wait for an embedding before treating the lookup as a miss
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "2.0"))
+
+# Embeddings kept in-process so a miss followed by store() embeds once
+RECENT_EMBEDDINGS = 256
+
+
+class OpenAIEmbedder:
+    """Embed text with the OpenAI embeddings API over one pooled client"""
+
+    def __init__(self, model: str = EMBEDDING_MODEL, timeout: float = EMBEDDING_TIMEOUT):
+        self.model = model
+        self.timeout = timeout
+        self._client = None  # created on first use, so a missing API key only disables caching
+
+    async def __call__(self, text: str) -> List[float]:
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(timeout=self.timeout, max_retries=0)
+        response = await self._client.embeddings.create(model=self.model, input=text)
+        return response.data[0].embedding
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+
+
+class SemanticCache:
+    """Embedding-keyed cache backed by Redis vector search"""
+
+    def __init__(
+        self,
+        redis_url: str,
+        embedder: Embedder,
+        threshold: float = 0.15,
+        dim: int = EMBEDDING_DIM,
+        embed_timeout: float = EMBEDDING_TIMEOUT
+    ):
+        self.redis = redis.from_url(redis_url)
+        self.embedder = embedder
+        self.embed_timeout = embed_timeout
+        self.threshold = threshold  # max cosine distance counted as a hit
+        self.dim = dim
+        self._index_ready = False
+        self._recent: "OrderedDict[str, bytes]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """Build a cache from REDIS_URL, or None when caching is disabled"""
+        redis_url = os.getenv("REDIS_URL")
+        if not redis_url:
+            return None
+        return cls(
+            redis_url,
+            OpenAIEmbedder(),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.15"))
+        )
+
+    async def lookup(self, text: str, namespace: str) -> Optional[Any]:
+        """
+        Return the cached value for the nearest stored text, if close enough.
+
+        Args:
+            text: Input text (e.g. message body)
+            namespace: Cache partition, e.g. "triage:<tenant_id>"
+
+        Returns:
+            Decoded JSON value, or None on a miss or when Redis or the embedder fails
+        """
+        vector = await self._embed(text)
+        if vector is None:
+            return None
+        try:
+            await self._ensure_index()
+            query = (
+                Query(f"(@namespace:{{{_escape_tag(namespace)}}})=>[KNN 1 @embedding $vec AS distance]")
+                .return_fields("value", "distance")
+                .sort_by("distance")
+                .dialect(2)
+            )
+            result = await self.redis.ft(INDEX_NAME).search(
+                query,
+                query_params={"vec": vector}
+            )
+        except redis.RedisError:
+            return None
+
+        if not result.docs or float(result.docs[0].distance) > self.threshold:
+            return None
+        return orjson.loads(result.docs[0].value)
+
+    async def store(self, text: str, value: Any, namespace: str, ttl: int = 86400):
+        """
+        Cache a JSON-serializable value under the embedding of text.
+
+        Args:
+            text: Input text the value was computed from
+            value: JSON-serializable result
+            namespace: Cache partition, e.g. "triage:<tenant_id>"
+            ttl: Expiry in seconds
+        """
+        vector = await self._embed(text)
+        if vector is None:
+            return
+        key = f"{KEY_PREFIX}{namespace}:{uuid.uuid4().hex}"
+        try:
+            await self._ensure_index()
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={
+                    "namespace": namespace,
+                    "embedding": vector,
+                    "value": orjson.dumps(value, default=str)
+                })
+                pipe.expire(key, ttl)
+                await pipe.execute()
+        except redis.RedisError:
+            pass
+
+    async def aclose(self):
+        """Close the Redis connection pool and the embedder's client"""
+        await self.redis.aclose()
+        if hasattr(self.embedder, "aclose"):
+            await self.embedder.aclose()
+
+    async def _embed(self, text: str) -> Optional[bytes]:
+        """Embed text as a packed float32 vector, reusing recent results (None on failure)"""
+        vector = self._recent.get(text)
+        if vector is None:
+            try:
+                embedding = await asyncio.wait_for(self.embedder(text), self.embed_timeout)
+            except Exception:  # timeout, auth or connection error: caller treats it as a miss
+                return None
+            vector = array.array("f", embedding).tobytes()
+            self._recent[text] = vector
+            if len(self._recent) > RECENT_EMBEDDINGS:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(text)
+        return vector
+
+    async def _ensure_index(self):
+        """Create the HNSW vector index on first use"""
+        if self._index_ready:
+            return
+        try:
+            await self.redis.ft(INDEX_NAME).info()
+        except redis.ResponseError:
+            await self.redis.ft(INDEX_NAME).create_index(
+                [
+                    TagField("namespace"),
+                    VectorField("embedding", "HNSW", {
+                        "TYPE": "FLOAT32",
+                        "DIM": self.dim,
+                        "DISTANCE_METRIC": "COSINE"
+                    })
+                ],
+                definition=IndexDefinition(prefix=[KEY_PREFIX], index_type=IndexType.HASH)
+            )
+        self._index_ready = True
+
+
+def _escape_tag(value: str) -> str:
+    """Escape RediSearch tag punctuation (tenant IDs often contain '-')"""
+    return "".join(c if c.isalnum() or c == "_" else f"\\{c}" for c in value)
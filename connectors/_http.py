@@ -0,0 +1,72 @@
+"""Shared HTTP client for Google API connectors
+
+All Gmail and Calendar calls go through one pooled HTTP/2 client so
+concurrent workflows reuse TCP+TLS connections (and multiplex calls
+fanned out with asyncio.gather over a single connection) instead of
+paying a handshake per request. The orchestrator's lifespan creates the
+client, keeps it on app.state.http, and passes it to each connector call.
+"""
+
+from typing import Dict, Tuple
+import time
+
+import httpx
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1/users/me"
+CALENDAR_API_URL = "https://www.googleapis.com/calendar/v3"
+
+# Refresh access tokens slightly before Google expires them
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+# refresh_token -> (access_token, expires_at monotonic seconds)
+_access_tokens: Dict[str, Tuple[str, float]] = {}
+
+
+def create_client() -> httpx.AsyncClient:
+    """Create the pooled client the orchestrator shares across connector calls"""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+    )
+
+
+async def get_auth_headers(
+    client: httpx.AsyncClient,
+    credentials: Dict[str, str]
+) -> Dict[str, str]:
+    """
+    Build an Authorization header for Google APIs.
+
+    Access tokens are exchanged from the OAuth2 refresh token and reused
+    until shortly before they expire.
+
+    Args:
+        client: HTTP client for the token request
+        credentials: Dict with client_id, client_secret, refresh_token
+
+    Returns:
+        Headers dict with a Bearer access token (RuntimeError if the
+        credentials have no refresh token)
+    """
+    refresh_token = credentials["refresh_token"]
+    if not refresh_token:
+        raise RuntimeError("Google API credentials are not configured (no refresh token)")
+
+    cached = _access_tokens.get(refresh_token)
+    if cached and cached[1] > time.monotonic():
+        return {"Authorization": f"Bearer {cached[0]}"}
+
+    response = await client.post(GOOGLE_TOKEN_URL, data={
+        "client_id": credentials["client_id"],
+        "client_secret": credentials["client_secret"],
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token"
+    })
+    response.raise_for_status()
+    token = response.json()
+
+    expires_at = time.monotonic() + token.get("expires_in", 3600) - TOKEN_EXPIRY_MARGIN_SECONDS
+    _access_tokens[refresh_token] = (token["access_token"], expires_at)
+    return {"Authorization": f"Bearer {token['access_token']}"}
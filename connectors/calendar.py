@@ -4,14 +4,29 @@ Provides functions to interact with Google Calendar API for finding availability
 and creating events.
 """
 
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone, time as dt_time
+from zoneinfo import ZoneInfo
+import math
 import os
 
+import httpx
+import numpy as np
+
 from schemas import TenantConfig
+from connectors._http import CALENDAR_API_URL, get_auth_headers
+
+# (start, end) pair in UTC
+Interval = Tuple[datetime, datetime]
+
+MINUTES_PER_DAY = 24 * 60
 
+# Proposed slots start on multiples of this many minutes
+SLOT_ALIGN_MINUTES = 15
 
-def find_calendar_slots(
+
+async def find_calendar_slots(
+    client: httpx.AsyncClient,
     tenant_config: TenantConfig,
     num_slots: int = 3,
     duration_minutes: int = 30,
@@ -19,42 +34,79 @@ def find_calendar_slots(
 ) -> List[Dict[str, Any]]:
     """
     Find available calendar slots for scheduling.
-    
+
+    Builds a minute-resolution availability mask over the search window
+    (working hours set, busy periods cleared) and proposes at most one
+    slot per day, taking the earliest free run that fits the duration.
+
     Args:
+        client: Shared HTTP client from the orchestrator
         tenant_config: Tenant configuration with timezone and working hours
         num_slots: Number of time slots to return
         duration_minutes: Duration of each slot in minutes
         days_ahead: How many days ahead to search
-    
+
     Returns:
         List of available time slots with start time and duration
-    
-    TODO: Implement using google-api-python-client:
-    - Initialize Calendar service with OAuth2 credentials
-    - Query freebusy API for availability
-    - Filter by working_hours_start, working_hours_end, working_days
-    - Return time slots in tenant timezone
-    - Consider buffer time between meetings
     """
-    # Placeholder implementation - returns mock slots
-    print(f"TODO: Find calendar slots for tenant {tenant_config.tenant_id}")
-    
-    # Return placeholder slots for demo purposes
-    now = datetime.utcnow()
-    slots = []
-    
-    for i in range(num_slots):
-        start_time = now + timedelta(days=i+1, hours=10)  # 10 AM next day
-        slots.append({
-            "start": start_time.isoformat(),
+    tz = ZoneInfo(tenant_config.timezone)
+    # Minute 0 is the next SLOT_ALIGN_MINUTES boundary, so aligned offsets are aligned clock times
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    origin = now + timedelta(minutes=SLOT_ALIGN_MINUTES - now.minute % SLOT_ALIGN_MINUTES)
+    n_minutes = days_ahead * MINUTES_PER_DAY
+    busy = await _query_busy(
+        client,
+        tenant_config.tenant_id,
+        origin,
+        origin + timedelta(minutes=n_minutes)
+    )
+
+    mask = working_hours_mask(tenant_config, origin, n_minutes)
+    for busy_start, busy_end in busy:
+        mask[_minute_index(origin, busy_start, n_minutes):
+             _minute_index(origin, busy_end, n_minutes, round_up=True)] = 0
+
+    runs = _find_runs(mask, duration_minutes)
+    return [
+        {
+            "start": start.isoformat(),
             "duration_minutes": duration_minutes,
             "timezone": tenant_config.timezone
-        })
-    
-    return slots
+        }
+        for start in _first_slot_per_day(runs, origin, tz, duration_minutes, num_slots)
+    ]
 
 
-def create_event(
+def working_hours_mask(tenant_config: TenantConfig, origin: datetime, n_minutes: int) -> np.ndarray:
+    """
+    Minute-resolution mask of the tenant's working hours.
+
+    Args:
+        tenant_config: Tenant configuration with timezone and working hours
+        origin: UTC datetime of minute 0
+        n_minutes: Length of the mask
+
+    Returns:
+        uint8 array where 1 marks a working minute
+    """
+    tz = ZoneInfo(tenant_config.timezone)
+    mask = np.zeros(n_minutes, dtype=np.uint8)
+    first_day = origin.astimezone(tz).date()
+
+    for offset in range(n_minutes // MINUTES_PER_DAY + 2):
+        day = first_day + timedelta(days=offset)
+        if day.weekday() not in tenant_config.working_days:
+            continue
+        day_start = datetime.combine(day, dt_time(tenant_config.working_hours_start), tz)
+        day_end = datetime.combine(day, dt_time(tenant_config.working_hours_end), tz)
+        mask[_minute_index(origin, day_start, n_minutes, round_up=True):
+             _minute_index(origin, day_end, n_minutes)] = 1
+
+    return mask
+
+
+async def create_event(
+    client: httpx.AsyncClient,
     tenant_id: str,
     title: str,
     start_time: datetime,
@@ -64,71 +116,71 @@ def create_event(
 ) -> str:
     """
     Create calendar event.
-    
+
     Args:
+        client: Shared HTTP client from the orchestrator
         tenant_id: Tenant identifier for API credentials
         title: Event title/subject
         start_time: Event start time
         duration_minutes: Event duration
         attendees: List of attendee email addresses
         description: Event description/body
-    
+
     Returns:
         Event ID of created event
-    
-    TODO: Implement using google-api-python-client:
-    - Initialize Calendar service with OAuth2 credentials
-    - Create event with proper start/end times
-    - Add attendees with sendNotifications=true
-    - Set event description and location if needed
-    - Return event ID
     """
-    # Placeholder implementation
-    print(f"TODO: Create calendar event '{title}' for tenant {tenant_id}")
-    print(f"  Start: {start_time}")
-    print(f"  Duration: {duration_minutes} minutes")
-    print(f"  Attendees: {', '.join(attendees)}")
-    
-    return "placeholder-event-id"
+    start_time = _as_utc(start_time)
+    end_time = start_time + timedelta(minutes=duration_minutes)
+
+    headers = await get_auth_headers(client, get_calendar_credentials(tenant_id))
+    response = await client.post(
+        f"{CALENDAR_API_URL}/calendars/primary/events",
+        params={"sendUpdates": "all"},
+        json={
+            "summary": title,
+            "description": description,
+            "start": {"dateTime": start_time.isoformat()},
+            "end": {"dateTime": end_time.isoformat()},
+            "attendees": [{"email": email} for email in attendees]
+        },
+        headers=headers
+    )
+    response.raise_for_status()
+    return response.json()["id"]
 
 
-def check_availability(
+async def check_availability(
+    client: httpx.AsyncClient,
     tenant_id: str,
     start_time: datetime,
     end_time: datetime
 ) -> bool:
     """
     Check if time slot is available.
-    
+
     Args:
+        client: Shared HTTP client from the orchestrator
         tenant_id: Tenant identifier
         start_time: Slot start time
         end_time: Slot end time
-    
+
     Returns:
         True if slot is free, False if busy
-    
-    TODO: Implement using google-api-python-client:
-    - Initialize Calendar service
-    - Call freebusy.query() for time range
-    - Check if any busy periods overlap with requested slot
-    - Return availability boolean
     """
-    # Placeholder implementation
-    print(f"TODO: Check availability for tenant {tenant_id}")
-    return True
+    busy = await _query_busy(client, tenant_id, _as_utc(start_time), _as_utc(end_time))
+    return not busy
 
 
 def get_calendar_credentials(tenant_id: str) -> Dict[str, str]:
     """
     Retrieve Google Calendar API credentials for tenant.
-    
+
     Args:
         tenant_id: Tenant identifier
-    
+
     Returns:
         Dict with client_id, client_secret, refresh_token
-    
+
     TODO: Implement credential storage/retrieval:
     - Fetch from secure credential store (AWS Secrets Manager, etc.)
     - Or load from environment variables for single-tenant mode
@@ -140,3 +192,84 @@ def get_calendar_credentials(tenant_id: str) -> Dict[str, str]:
         "client_secret": os.getenv("GOOGLE_CLIENT_SECRET", ""),
         "refresh_token": os.getenv("GOOGLE_REFRESH_TOKEN", "")
     }
+
+
+async def _query_busy(
+    client: httpx.AsyncClient,
+    tenant_id: str,
+    time_min: datetime,
+    time_max: datetime
+) -> List[Interval]:
+    """Return busy intervals on the primary calendar, sorted by start"""
+    headers = await get_auth_headers(client, get_calendar_credentials(tenant_id))
+    response = await client.post(
+        f"{CALENDAR_API_URL}/freeBusy",
+        json={
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "items": [{"id": "primary"}]
+        },
+        headers=headers
+    )
+    response.raise_for_status()
+
+    busy = response.json()["calendars"]["primary"].get("busy", [])
+    return sorted(
+        (_parse_time(b["start"]), _parse_time(b["end"])) for b in busy
+    )
+
+
+def _find_runs(mask: np.ndarray, min_length: int) -> np.ndarray:
+    """Return (start, end) index pairs of runs of 1s at least min_length long"""
+    padded = np.zeros(mask.size + 2, dtype=np.int8)
+    padded[1:-1] = mask
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = ends - starts >= min_length
+    return np.column_stack((starts[keep], ends[keep]))
+
+
+def _first_slot_per_day(
+    runs: np.ndarray,
+    origin: datetime,
+    tz: ZoneInfo,
+    duration_minutes: int,
+    num_slots: int
+) -> List[datetime]:
+    """Earliest aligned slot start in each local day, from (start, end) free runs"""
+    # Start slots on SLOT_ALIGN_MINUTES boundaries within each free run
+    starts = runs[:, 0] + (-runs[:, 0] % SLOT_ALIGN_MINUTES)
+    starts = starts[runs[:, 1] - starts >= duration_minutes]
+
+    slot_starts: List[datetime] = []
+    proposed_days = set()
+    for start in starts.tolist():
+        slot_start = (origin + timedelta(minutes=start)).astimezone(tz)
+        if slot_start.date() in proposed_days:
+            continue
+        proposed_days.add(slot_start.date())
+        slot_starts.append(slot_start)
+        if len(slot_starts) >= num_slots:
+            break
+
+    return slot_starts
+
+
+def _minute_index(origin: datetime, value: datetime, n_minutes: int, round_up: bool = False) -> int:
+    """Offset of value from origin in whole minutes, clipped to [0, n_minutes]"""
+    minutes = (value - origin).total_seconds() / 60
+    minutes = math.ceil(minutes) if round_up else math.floor(minutes)
+    return min(max(minutes, 0), n_minutes)
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse an RFC 3339 timestamp returned by the Calendar API"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
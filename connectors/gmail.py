@@ -3,77 +3,102 @@
 Provides functions to interact with Gmail API for fetching threads and sending replies.
 """
 
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+from email.message import EmailMessage
+import base64
 import os
 
+import httpx
+
 from schemas import ThreadHistory, Message
+from connectors._http import GMAIL_API_URL, get_auth_headers
 
 
-def fetch_gmail_thread(thread_id: str, tenant_id: str) -> ThreadHistory:
+async def fetch_gmail_thread(
+    client: httpx.AsyncClient,
+    thread_id: str,
+    tenant_id: str
+) -> ThreadHistory:
     """
     Fetch email thread history from Gmail.
-    
+
     Args:
+        client: Shared HTTP client from the orchestrator
         thread_id: Gmail thread ID
         tenant_id: Tenant identifier for API credentials
-    
+
     Returns:
         ThreadHistory with all messages in thread
-    
-    TODO: Implement using google-api-python-client:
-    - Initialize Gmail service with OAuth2 credentials
-    - Call threads().get(userId='me', id=thread_id)
-    - Parse response into Message objects
-    - Return ThreadHistory
     """
-    # Placeholder implementation
-    print(f"TODO: Fetch Gmail thread {thread_id} for tenant {tenant_id}")
-    return ThreadHistory(messages=[])
+    headers = await get_auth_headers(client, get_gmail_credentials(tenant_id))
+    response = await client.get(
+        f"{GMAIL_API_URL}/threads/{thread_id}",
+        params={"format": "full"},
+        headers=headers
+    )
+    response.raise_for_status()
 
+    return ThreadHistory(messages=[
+        _parse_message(raw) for raw in response.json().get("messages", [])
+    ])
 
-def send_reply(
+
+async def send_reply(
+    client: httpx.AsyncClient,
     thread_id: str,
     to_email: str,
     subject: str,
     body: str,
-    tenant_id: str
+    tenant_id: str,
+    in_reply_to: Optional[str] = None
 ) -> str:
     """
     Send email reply via Gmail.
-    
+
     Args:
+        client: Shared HTTP client from the orchestrator
         thread_id: Gmail thread ID to reply to
         to_email: Recipient email address
         subject: Email subject (with Re: prefix)
         body: Email body text
         tenant_id: Tenant identifier for API credentials
-    
+        in_reply_to: RFC 822 Message-ID header of the message being answered
+
     Returns:
         Message ID of sent email
-    
-    TODO: Implement using google-api-python-client:
-    - Initialize Gmail service with OAuth2 credentials
-    - Create MIME message with proper headers
-    - Set In-Reply-To and References headers for threading
-    - Call messages().send(userId='me', body=message)
-    - Return sent message ID
     """
-    # Placeholder implementation
-    print(f"TODO: Send Gmail reply to {to_email} in thread {thread_id}")
-    return "placeholder-message-id"
+    mime = EmailMessage()
+    mime["To"] = to_email
+    mime["Subject"] = subject
+    if in_reply_to:
+        mime["In-Reply-To"] = in_reply_to
+        mime["References"] = in_reply_to
+    mime.set_content(body)
+
+    headers = await get_auth_headers(client, get_gmail_credentials(tenant_id))
+    response = await client.post(
+        f"{GMAIL_API_URL}/messages/send",
+        json={
+            "raw": base64.urlsafe_b64encode(mime.as_bytes()).decode(),
+            "threadId": thread_id
+        },
+        headers=headers
+    )
+    response.raise_for_status()
+    return response.json()["id"]
 
 
 def get_gmail_credentials(tenant_id: str) -> Dict[str, str]:
     """
     Retrieve Gmail API credentials for tenant.
-    
+
     Args:
         tenant_id: Tenant identifier
-    
+
     Returns:
         Dict with client_id, client_secret, refresh_token
-    
+
     TODO: Implement credential storage/retrieval:
     - Fetch from secure credential store (AWS Secrets Manager, etc.)
     - Or load from environment variables for single-tenant mode
@@ -85,3 +110,32 @@ def get_gmail_credentials(tenant_id: str) -> Dict[str, str]:
         "client_secret": os.getenv("GOOGLE_CLIENT_SECRET", ""),
         "refresh_token": os.getenv("GOOGLE_REFRESH_TOKEN", "")
     }
+
+
+def _parse_message(raw: Dict[str, Any]) -> Message:
+    """Convert a Gmail API message resource into a Message"""
+    payload = raw.get("payload", {})
+    headers = {h["name"].lower(): h["value"] for h in payload.get("headers", [])}
+
+    return Message(
+        subject=headers.get("subject", ""),
+        body_text=_find_body(payload, "text/plain") or raw.get("snippet", ""),
+        body_html=_find_body(payload, "text/html"),
+        received_at=datetime.fromtimestamp(int(raw["internalDate"]) / 1000, tz=timezone.utc),
+        message_id=raw["id"],
+        thread_id=raw["threadId"]
+    )
+
+
+def _find_body(part: Dict[str, Any], mime_type: str) -> Optional[str]:
+    """Depth-first search of a MIME part tree for a body of the given type"""
+    data = part.get("body", {}).get("data")
+    if part.get("mimeType") == mime_type and data:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", "replace")
+
+    children: List[Dict[str, Any]] = part.get("parts", [])
+    for child in children:
+        body = _find_body(child, mime_type)
+        if body is not None:
+            return body
+    return None
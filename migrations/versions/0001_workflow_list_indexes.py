@@ -0,0 +1,53 @@
+"""Index workflows for list_workflows filters and keyset pagination
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+
+list_workflows pages on (created_at, workflow_id), so each index ends
+with workflow_id and rows sharing a created_at are not skipped at page
+boundaries. The orchestrator creates missing tables (with these indexes)
+on startup, so this migration only upgrades databases created before the
+indexes existed. Indexes are built CONCURRENTLY to avoid locking writes.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_wf_created_id", ["created_at", "workflow_id"]),
+    ("ix_wf_tenant_created_id", ["tenant_id", "created_at", "workflow_id"]),
+    ("ix_wf_status_created_id", ["status", "created_at", "workflow_id"]),
+]
+
+
+def upgrade():
+    context = op.get_context()
+    if not context.as_sql and not sa.inspect(op.get_bind()).has_table("workflows"):
+        return
+
+    with context.autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                "workflows",
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name="workflows",
+                postgresql_concurrently=True,
+                if_exists=True
+            )
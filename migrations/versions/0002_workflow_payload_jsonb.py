@@ -0,0 +1,40 @@
+"""Store workflows.payload as JSONB
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15
+
+JSONB is stored in a decomposed binary form, so reads do not reparse
+the document and the payload can be indexed or queried by key.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    context = op.get_context()
+    if not context.as_sql and not sa.inspect(op.get_bind()).has_table("workflows"):
+        return
+
+    op.alter_column(
+        "workflows",
+        "payload",
+        type_=postgresql.JSONB(),
+        postgresql_using="payload::jsonb"
+    )
+
+
+def downgrade():
+    op.alter_column(
+        "workflows",
+        "payload",
+        type_=sa.JSON(),
+        postgresql_using="payload::json"
+    )
@@ -0,0 +1,53 @@
+"""Store workflow timestamps as timestamptz
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15
+
+The orchestrator writes timezone-aware UTC datetimes, which asyncpg
+rejects for plain timestamp columns. Existing naive values were written
+as UTC, so they are converted with AT TIME ZONE 'UTC'.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["created_at", "updated_at"]
+
+
+def upgrade():
+    context = op.get_context()
+    if context.as_sql:
+        columns = COLUMNS
+    else:
+        inspector = sa.inspect(op.get_bind())
+        if not inspector.has_table("workflows"):
+            return
+        # Tables created by the orchestrator already use timestamptz
+        columns = [
+            column["name"] for column in inspector.get_columns("workflows")
+            if column["name"] in COLUMNS and not column["type"].timezone
+        ]
+
+    for column in columns:
+        op.alter_column(
+            "workflows",
+            column,
+            type_=sa.DateTime(timezone=True),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+        )
+
+
+def downgrade():
+    for column in COLUMNS:
+        op.alter_column(
+            "workflows",
+            column,
+            type_=sa.DateTime(),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+        )
@@ -0,0 +1,128 @@
+"""QA risk scoring
+
+Combines classification confidence, message length and risky-keyword
+counts into a 0.0-1.0 risk score. The numeric kernel is compiled by
+Numba when this module is imported (explicit signature, cached on disk),
+so scoring a workflow costs a single native call.
+"""
+
+from typing import List, Tuple
+import re
+
+import numpy as np
+from numba import njit
+
+from schemas import WorkflowPayload
+
+# (name, pattern, weight per occurrence) - each hit makes auto-sending riskier
+RISK_KEYWORDS: List[Tuple[str, str, float]] = [
+    ("legal", r"\b(?:lawyer|solicitor|legal action|lawsuit|sue|gdpr|data protection)\b", 0.3),
+    ("complaint", r"\b(?:complaint|complain|unacceptable|disappointed|frustrated)\b", 0.15),
+    ("cancellation", r"\b(?:cancel|cancellation|terminate|chargeback)\b", 0.15),
+    ("urgency", r"\b(?:urgent|asap|immediately|emergency)\b", 0.05),
+]
+
+# Occurrences of one keyword group counted towards the score
+MAX_KEYWORD_HITS = 2
+
+# Bodies at least this long (characters) get the full length penalty
+LONG_BODY_CHARS = 4000
+
+# Risk above this escalates to a human
+ESCALATION_RISK = 0.7
+
+# Draft text that completes a sentence, triggering a re-score while streaming
+_SENTENCE_END = re.compile(r"[.!?\n]")
+
+_KEYWORD_PATTERNS = [re.compile(pattern, re.IGNORECASE) for _, pattern, _ in RISK_KEYWORDS]
+_KEYWORD_WEIGHTS = np.array([weight for _, _, weight in RISK_KEYWORDS], dtype=np.float64)
+
+
+@njit("float64(float64, int64, int64[:], float64[:])", cache=True, fastmath=True)
+def _risk_kernel(confidence, len_body, kw_counts, weights):
+    risk = 0.5 * (1.0 - confidence)
+    risk += 0.1 * min(len_body / LONG_BODY_CHARS, 1.0)
+    for i in range(kw_counts.shape[0]):
+        risk += weights[i] * min(kw_counts[i], MAX_KEYWORD_HITS)
+    return min(max(risk, 0.0), 1.0)
+
+
+def keyword_counts(text: str) -> np.ndarray:
+    """Count occurrences of each RISK_KEYWORDS group in text"""
+    return np.fromiter(
+        (len(pattern.findall(text)) for pattern in _KEYWORD_PATTERNS),
+        dtype=np.int64,
+        count=len(_KEYWORD_PATTERNS)
+    )
+
+
+def score_qa_risk(payload: WorkflowPayload) -> float:
+    """
+    Score how risky it is to act on this workflow without a human.
+
+    Args:
+        payload: Workflow payload after triage and worker agents
+
+    Returns:
+        Risk score between 0.0 (safe) and 1.0 (escalate)
+    """
+    message = payload.message
+    confidence = payload.classification.confidence if payload.classification else 0.0
+
+    return _risk_kernel(
+        confidence,
+        len(message.body_text),
+        keyword_counts(f"{message.subject}\n{message.body_text}"),
+        _KEYWORD_WEIGHTS
+    )
+
+
+class StreamingRiskMonitor:
+    """
+    Score a reply draft while the LLM is still generating it.
+
+    Keyword counts are kept as running totals: each time a sentence
+    completes, only the text since the previous sentence end is scanned,
+    so an escalation can be detected (and generation stopped) before the
+    full reply has streamed, at linear cost in the draft length.
+    """
+
+    def __init__(self, confidence: float):
+        self.confidence = confidence
+        self.risk = 0.0
+        self._chunks: List[str] = []
+        self._length = 0
+        self._pending = ""  # text after the last scanned sentence end
+        self._counts = np.zeros(len(_KEYWORD_PATTERNS), dtype=np.int64)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    @property
+    def should_escalate(self) -> bool:
+        return self.risk > ESCALATION_RISK
+
+    def feed(self, chunk: str) -> float:
+        """Append a streamed chunk and return the current draft risk"""
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        self._pending += chunk
+        # Keywords never span a sentence end, so complete sentences can be counted now
+        ends = [match.end() for match in _SENTENCE_END.finditer(chunk)]
+        if ends:
+            split = len(self._pending) - len(chunk) + ends[-1]
+            self._counts += keyword_counts(self._pending[:split])
+            self._pending = self._pending[split:]
+            self._score()
+        return self.risk
+
+    def finish(self) -> float:
+        """Score the full draft (call once the stream has ended)"""
+        self._counts += keyword_counts(self._pending)
+        self._pending = ""
+        return self._score()
+
+    def _score(self) -> float:
+        self.risk = _risk_kernel(self.confidence, self._length, self._counts, _KEYWORD_WEIGHTS)
+        return self.risk
@@ -1,8 +1,10 @@
-from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timezone
 from enum import Enum
 
+import msgspec
+from msgspec import field
+
 
 class Intent(str, Enum):
     SCHEDULING = "scheduling"
@@ -26,38 +28,36 @@ class QADecision(str, Enum):
     ESCALATE = "escalate"
 
 
-@dataclass
-class Contact:
+# Structs holding only scalars (or lists of them) can never form reference
+# cycles; gc=False keeps these many short-lived instances out of the cyclic GC
+class Contact(msgspec.Struct, gc=False):
     email: str
     name: Optional[str] = None
     org_id: Optional[str] = None
 
 
-@dataclass
-class Message:
+class Message(msgspec.Struct, gc=False):
     subject: str
     body_text: str
-    body_html: Optional[str] = None
     received_at: datetime
     message_id: str
     thread_id: str
+    body_html: Optional[str] = None
 
 
-@dataclass
-class ThreadHistory:
+class ThreadHistory(msgspec.Struct):
     messages: List[Message] = field(default_factory=list)
 
 
-@dataclass
-class Classification:
-    intent: Intent
+class Classification(msgspec.Struct, gc=False):
+    intent: Intent  # primary intent
+    intents: List[Intent] = field(default_factory=list)  # every intent detected, primary first
     sub_intent: Optional[str] = None
     priority: Priority = Priority.NORMAL
     confidence: float = 0.0  # 0.0 to 1.0
 
 
-@dataclass
-class Action:
+class Action(msgspec.Struct):
     action_type: str  # "reply", "create_event", "create_task", "enrich_lead"
     tool_name: Optional[str] = None
     tool_args: Dict[str, Any] = field(default_factory=dict)
@@ -65,20 +65,19 @@ class Action:
     status: str = "pending"  # "pending", "completed", "failed"
 
 
-@dataclass
-class TenantConfig:
+# Frozen, with immutable fields: instances are cached and shared across workflows
+class TenantConfig(msgspec.Struct, frozen=True, gc=False):
     tenant_id: str
     timezone: str = "Europe/London"
     working_hours_start: int = 9  # hour (0-23)
     working_hours_end: int = 17
-    working_days: List[int] = field(default_factory=lambda: [0, 1, 2, 3, 4])  # 0=Mon
+    working_days: Tuple[int, ...] = (0, 1, 2, 3, 4)  # 0=Mon
     tone: str = "professional"
     auto_send_enabled: bool = False
     escalation_threshold: float = 0.7  # confidence below this → escalate
 
 
-@dataclass
-class WorkflowPayload:
+class WorkflowPayload(msgspec.Struct):
     workflow_id: str  # UUID
     tenant_id: str
     correlation_id: str  # for distributed tracing
@@ -94,10 +93,11 @@ class WorkflowPayload:
     classification: Optional[Classification] = None
     qa_decision: Optional[QADecision] = None
     qa_risk_score: Optional[float] = None  # 0.0 to 1.0
+    draft_risk_score: Optional[float] = None  # risk of the drafted reply, scored while streaming
 
     # Actions planned and executed
     action_plan: List[Action] = field(default_factory=list)
 
     # Metadata
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    updated_at: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,690 @@
+"""Behaviour tests for the orchestrator, agents, triage rules, connectors and scoring."""
+
+import asyncio
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import httpx
+import msgspec
+import numpy as np
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import agents
+import orchestrator
+from orchestrator import _drain_automation_events, _payload_builtins, _tenant_config
+from agents import agent, draft_with_qa
+from cache import SemanticCache
+from connectors import _http, calendar
+from connectors.calendar import _find_runs, _first_slot_per_day
+from connectors.gmail import _find_body, _parse_message, fetch_gmail_thread
+from qa_scoring import StreamingRiskMonitor, _risk_kernel, _KEYWORD_WEIGHTS, keyword_counts
+from schemas import Action, Classification, Intent, Priority, QADecision, TenantConfig, WorkflowPayload
+from triage_rules import classify_by_rules
+
+
+def make_payload(body_text: str, confidence: float = 0.9, intents=(Intent.SUPPORT,)) -> WorkflowPayload:
+    """Build a minimal payload around one inbound message."""
+    payload = msgspec.convert({
+        "workflow_id": "wf-1",
+        "tenant_id": "tenant-1",
+        "correlation_id": "wf-1",
+        "source": {"channel": "gmail", "thread_id": "t-1", "message_id": "m-1"},
+        "contact": {"email": "client@example.com"},
+        "message": {
+            "subject": "Hello",
+            "body_text": body_text,
+            "received_at": datetime.now(timezone.utc),
+            "message_id": "m-1",
+            "thread_id": "t-1"
+        },
+        "thread_history": {},
+        "tenant_config": {"tenant_id": "tenant-1"}
+    }, WorkflowPayload)
+    payload.classification = Classification(intent=intents[0], intents=list(intents), confidence=confidence)
+    return payload
+
+
+async def stream(*chunks: str):
+    """Yield chunks as a streamed draft."""
+    for chunk in chunks:
+        yield chunk
+
+
+def gmail_message(message_id: str, body_text: str) -> dict:
+    """Gmail API message resource with a plain-text part."""
+    return {
+        "id": message_id,
+        "threadId": "t-1",
+        "internalDate": "1736935800000",
+        "snippet": body_text[:20],
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [{"name": "Subject", "value": "Hello"}],
+            "parts": [
+                {"mimeType": "text/plain", "body": {"data": base64.urlsafe_b64encode(body_text.encode()).decode()}}
+            ]
+        }
+    }
+
+
+def google_client(requests: list, thread_messages=()) -> httpx.AsyncClient:
+    """Client answering Google token and Gmail thread requests, recording each request."""
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url == _http.GOOGLE_TOKEN_URL:
+            return httpx.Response(200, json={"access_token": "token-1", "expires_in": 3600})
+        return httpx.Response(200, json={"messages": list(thread_messages)})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+
+@pytest.fixture
+def google_credentials(monkeypatch):
+    """Configured Google credentials and an empty access token cache."""
+    monkeypatch.setenv("GOOGLE_CLIENT_ID", "client-1")
+    monkeypatch.setenv("GOOGLE_CLIENT_SECRET", "secret-1")
+    monkeypatch.setenv("GOOGLE_REFRESH_TOKEN", "refresh-1")
+    monkeypatch.setattr(_http, "_access_tokens", {})
+
+
+@pytest.fixture
+def free_calendar(monkeypatch):
+    """Calendar with no busy periods."""
+    async def fake_query_busy(client, tenant_id, time_min, time_max):
+        return []
+
+    monkeypatch.setattr(calendar, "_query_busy", fake_query_busy)
+
+
+class TestClassifyByRules:
+    """Keyword triage decides only unambiguous messages."""
+
+    def test_agreeing_rules_classify(self):
+        """Rules that agree on one intent classify without the LLM."""
+        result = classify_by_rules("Reschedule", "Can we book a call next week instead?")
+        assert result.intent == Intent.SCHEDULING
+        assert result.priority == Priority.NORMAL
+
+    def test_conflicting_rules_defer(self):
+        """Rules that disagree on the intent leave the message to the LLM."""
+        assert classify_by_rules("Invoice", "Can we book a call about it?") is None
+
+    def test_no_match_defers(self):
+        """Messages no rule matches are left to the LLM."""
+        assert classify_by_rules("Hello", "How do I export my data?") is None
+
+    def test_highest_priority_wins(self):
+        """The most urgent priority among the matching rules is kept."""
+        result = classify_by_rules("Invoice 1234", "Please refund this invoice.")
+        assert result.intent == Intent.BILLING
+        assert result.priority == Priority.HIGH
+
+    def test_scheduling_with_question_defers(self):
+        """A scheduling request that also asks something else goes to the LLM."""
+        assert classify_by_rules("Hi", "Can we book a call? Also how do I export X") is None
+
+
+class TestQAGuardrail:
+    """Only a planned, low-risk, confidently classified reply is auto-sent."""
+
+    @pytest.fixture
+    def auto_send_payload(self):
+        """Payload for a tenant with auto-send enabled."""
+        payload = make_payload("Thanks", confidence=0.95)
+        payload.tenant_config = TenantConfig(tenant_id="tenant-1", auto_send_enabled=True)
+        return payload
+
+    def test_planned_reply_auto_sent(self, auto_send_payload):
+        """A confident, low-risk reply is sent without review."""
+        auto_send_payload.action_plan.append(Action(action_type="reply", tool_name="gmail", tool_args={}))
+        payload, _ = asyncio.run(agents.qa_guardrail_agent(auto_send_payload))
+        assert payload.qa_decision == QADecision.AUTO_SEND
+
+    @pytest.mark.parametrize("body_text", ["Please unsubscribe me", "I want a refund"])
+    def test_rule_match_without_reply_not_auto_sent(self, body_text, monkeypatch):
+        """Rule-classified messages no worker answered are left as drafts."""
+        monkeypatch.setattr(agents, "semantic_cache", None)
+        payload = make_payload(body_text)
+        payload.tenant_config = TenantConfig(tenant_id="tenant-1", auto_send_enabled=True)
+        payload, _ = asyncio.run(agents.triage_agent(payload))
+        payload, log = asyncio.run(agents.qa_guardrail_agent(payload))
+        assert payload.classification.confidence > 0.85
+        assert log["decision"] == QADecision.DRAFT_ONLY.value
+
+
+class TestTenantConfigCache:
+    """Tenant configs are built once per (tenant, config) and cannot be changed."""
+
+    def test_same_config_shared(self):
+        """Requests with the same tenant and config share one instance."""
+        assert _tenant_config("tenant-1", "{}") is _tenant_config("tenant-1", "{}")
+        assert _tenant_config("tenant-1", "{}") is not _tenant_config("tenant-2", "{}")
+
+    def test_shared_config_is_immutable(self):
+        """A shared config cannot be changed by one request for the next."""
+        config = _tenant_config("tenant-1", '{"working_days": [0, 1]}')
+        assert config.working_days == (0, 1)
+        with pytest.raises(AttributeError):
+            config.working_days.append(6)
+        with pytest.raises(AttributeError):
+            config.tone = "casual"
+
+
+class TestPayloadBuiltins:
+    """Stored payloads splice in the tenant config's cached JSON."""
+
+    def test_spliced_config_matches_full_encoding(self):
+        """The stored document is the same as encoding the whole payload."""
+        config_key = '{"tone": "casual"}'
+        payload = make_payload("Hello")
+        payload.tenant_config = _tenant_config("tenant-1", config_key)
+        stored = orjson.loads(orjson.dumps(_payload_builtins(payload, config_key)))
+        assert stored == orjson.loads(msgspec.json.encode(payload))
+
+    def test_spliced_config_is_not_a_shared_dict(self):
+        """The spliced config is encoded JSON, not a dict shared with other requests."""
+        payload = make_payload("Hello")
+        first = _payload_builtins(payload, "{}")["tenant_config"]
+        assert not isinstance(first, dict)
+        assert orjson.loads(orjson.dumps(first))["tenant_id"] == "tenant-1"
+
+
+class RecordingCache:
+    """Semantic cache double that records stores and returns a fixed lookup result."""
+
+    def __init__(self, hit=None):
+        self.hit = hit
+        self.stored = []
+
+    async def lookup(self, text, namespace):
+        return self.hit
+
+    async def store(self, text, value, namespace, ttl=86400):
+        self.stored.append((namespace, value))
+
+
+class TestSemanticCache:
+    """Cache failures are misses, and placeholder results are never cached."""
+
+    @staticmethod
+    def unreachable_cache(embedder, embed_timeout=1.0) -> SemanticCache:
+        """Cache whose Redis socket does not exist."""
+        return SemanticCache("unix:///nonexistent/redis.sock", embedder, dim=3, embed_timeout=embed_timeout)
+
+    def test_embedder_error_is_miss(self):
+        """A failing embedder makes lookup miss and store a no-op."""
+        async def embedder(text):
+            raise RuntimeError("no API key")
+
+        async def run():
+            cache = self.unreachable_cache(embedder)
+            await cache.store("Hello", {"a": 1}, namespace="kb:tenant-1")
+            return await cache.lookup("Hello", namespace="kb:tenant-1")
+
+        assert asyncio.run(run()) is None
+
+    def test_embedder_timeout_is_miss(self):
+        """A slow embedder is abandoned after embed_timeout."""
+        async def embedder(text):
+            await asyncio.sleep(10)
+
+        cache = self.unreachable_cache(embedder, embed_timeout=0.01)
+        assert asyncio.run(cache.lookup("Hello", namespace="kb:tenant-1")) is None
+
+    def test_redis_error_is_miss(self):
+        """An unreachable Redis makes lookup miss and store a no-op."""
+        async def embedder(text):
+            return [0.1, 0.2, 0.3]
+
+        async def run():
+            cache = self.unreachable_cache(embedder)
+            await cache.store("Hello", {"a": 1}, namespace="kb:tenant-1")
+            return await cache.lookup("Hello", namespace="kb:tenant-1")
+
+        assert asyncio.run(run()) is None
+
+    def test_placeholder_results_not_stored(self, monkeypatch):
+        """Misses answered by placeholders leave the cache untouched."""
+        cache = RecordingCache()
+        monkeypatch.setattr(agents, "semantic_cache", cache)
+        asyncio.run(agents.triage_agent(make_payload("Tell me about your product")))
+        _, log = asyncio.run(agents.support_faq_agent(make_payload("How do I export my data?"), None))
+        assert log["status"] == "completed"
+        assert not cache.stored
+
+    def test_hit_skips_classification(self, monkeypatch):
+        """A cached classification is used and logged as a hit."""
+        cached = msgspec.to_builtins(Classification(intent=Intent.BILLING, intents=[Intent.BILLING], confidence=0.9))
+        monkeypatch.setattr(agents, "semantic_cache", RecordingCache(hit=cached))
+        payload, log = asyncio.run(agents.triage_agent(make_payload("Tell me about your product")))
+        assert log["cache_hit"] is True
+        assert payload.classification.intent == Intent.BILLING
+
+
+class TestGmailConnector:
+    """Gmail messages are parsed from their MIME tree and tokens are reused."""
+
+    def test_parse_nested_multipart(self):
+        """Plain and HTML bodies are found in nested parts, even without base64 padding."""
+        html = base64.urlsafe_b64encode(b"<p>Hi</p>").decode().rstrip("=")
+        raw = gmail_message("m-2", "Hi")
+        raw["payload"] = {
+            "mimeType": "multipart/mixed",
+            "headers": [{"name": "subject", "value": "Re: Hello"}],
+            "parts": [
+                {"mimeType": "multipart/alternative", "parts": [
+                    raw["payload"]["parts"][0],
+                    {"mimeType": "text/html", "body": {"data": html}}
+                ]},
+                {"mimeType": "application/pdf", "body": {"attachmentId": "a-1"}}
+            ]
+        }
+
+        message = _parse_message(raw)
+        assert message.subject == "Re: Hello"
+        assert message.body_text == "Hi"
+        assert message.body_html == "<p>Hi</p>"
+        assert message.received_at == datetime(2025, 1, 15, 10, 10, tzinfo=timezone.utc)
+        assert (message.message_id, message.thread_id) == ("m-2", "t-1")
+
+    def test_parse_falls_back_to_snippet(self):
+        """Without a text/plain part the snippet is used as the body."""
+        raw = gmail_message("m-2", "Only a snippet here")
+        raw["payload"]["parts"][0]["mimeType"] = "text/html"
+        message = _parse_message(raw)
+        assert message.body_text == "Only a snippet here"
+        assert _find_body(raw["payload"], "text/plain") is None
+
+    def test_access_token_reused(self, google_credentials):
+        """One token exchange serves later calls until the token expires."""
+        requests = []
+
+        async def run():
+            async with google_client(requests, [gmail_message("m-0", "Earlier")]) as client:
+                await fetch_gmail_thread(client, "t-1", "tenant-1")
+                await fetch_gmail_thread(client, "t-1", "tenant-1")
+
+        asyncio.run(run())
+        assert [r.url == _http.GOOGLE_TOKEN_URL for r in requests] == [True, False, False]
+        assert requests[1].headers["Authorization"] == requests[2].headers["Authorization"] == "Bearer token-1"
+
+    def test_expired_token_refreshed(self, google_credentials, monkeypatch):
+        """A token inside the expiry margin is exchanged again."""
+        monkeypatch.setattr(_http, "TOKEN_EXPIRY_MARGIN_SECONDS", 3600)
+        requests = []
+
+        async def run():
+            async with google_client(requests) as client:
+                await fetch_gmail_thread(client, "t-1", "tenant-1")
+                await fetch_gmail_thread(client, "t-1", "tenant-1")
+
+        asyncio.run(run())
+        assert [r.url == _http.GOOGLE_TOKEN_URL for r in requests] == [True, False, True, False]
+
+    def test_missing_credentials(self, google_credentials, monkeypatch):
+        """Without a refresh token no request is made and the error says why."""
+        monkeypatch.setenv("GOOGLE_REFRESH_TOKEN", "")
+        requests = []
+
+        async def run():
+            async with google_client(requests) as client:
+                await fetch_gmail_thread(client, "t-1", "tenant-1")
+
+        with pytest.raises(RuntimeError, match="not configured"):
+            asyncio.run(run())
+        assert not requests
+
+
+class TestFindRuns:
+    """Free runs are found in an availability mask."""
+
+    def test_runs_at_edges_and_middle(self):
+        """Runs touching either end of the mask are included."""
+        mask = np.array([1, 1, 0, 1, 1, 1, 0, 0, 1], dtype=np.uint8)
+        runs = _find_runs(mask, 1)
+        assert runs.tolist() == [[0, 2], [3, 6], [8, 9]]
+
+    def test_short_runs_dropped(self):
+        """Runs shorter than the minimum length are dropped."""
+        mask = np.array([1, 1, 0, 1, 1, 1, 0, 0, 1], dtype=np.uint8)
+        assert _find_runs(mask, 3).tolist() == [[3, 6]]
+
+    def test_empty_mask(self):
+        """A mask with no free minutes has no runs."""
+        assert _find_runs(np.zeros(10, dtype=np.uint8), 1).shape == (0, 2)
+
+
+class TestFindCalendarSlots:
+    """Slots are proposed from working hours minus busy periods."""
+
+    def test_first_slot_per_day(self):
+        """Starts are aligned, must still fit the run, and only the earliest per day is kept."""
+        origin = datetime(2025, 1, 6, tzinfo=timezone.utc)
+        runs = np.array([[7, 100], [200, 230], [300, 400], [1500, 1600], [3000, 3100]])
+        starts = _first_slot_per_day(runs, origin, ZoneInfo("UTC"), 30, num_slots=2)
+        assert starts == [origin + timedelta(minutes=15), origin + timedelta(minutes=1500)]
+
+    def test_slots_skip_busy_days(self, monkeypatch):
+        """One aligned, working-hours slot per day, none while busy."""
+        busy_until = {}
+
+        async def fake_query_busy(client, tenant_id, time_min, time_max):
+            busy_until["end"] = time_min + timedelta(days=2)
+            return [(time_min, busy_until["end"])]
+
+        monkeypatch.setattr(calendar, "_query_busy", fake_query_busy)
+        config = TenantConfig(tenant_id="tenant-1", timezone="Europe/London")
+        slots = asyncio.run(calendar.find_calendar_slots(None, config, num_slots=3, duration_minutes=30))
+
+        assert len(slots) == 3
+        starts = [datetime.fromisoformat(slot["start"]) for slot in slots]
+        assert len({start.date() for start in starts}) == 3
+        for start in starts:
+            assert start >= busy_until["end"]
+            assert start.weekday() in config.working_days
+            assert config.working_hours_start <= start.hour < config.working_hours_end
+            assert start.minute % calendar.SLOT_ALIGN_MINUTES == 0
+
+
+class TestSchedulingAgents:
+    """Scheduling agents propose slots from the calendar connector."""
+
+    def test_admin_scheduling_proposes_slots(self, free_calendar):
+        """Slots found by find_calendar_slots are counted and a reply is planned."""
+        payload, log = asyncio.run(
+            agents.admin_scheduling_agent(make_payload("Can we meet?", intents=(Intent.SCHEDULING,)), None)
+        )
+        assert log["status"] == "completed"
+        assert log["slots_proposed"] == 3
+        assert [action.action_type for action in payload.action_plan] == ["reply"]
+
+    def test_combined_worker_proposes_slots(self, free_calendar, monkeypatch):
+        """The combined worker gathers slots alongside the KB search."""
+        monkeypatch.setattr(agents, "semantic_cache", None)
+        payload = make_payload("Can we meet? How do I export?", intents=(Intent.SCHEDULING, Intent.SUPPORT))
+        _, log = asyncio.run(agents.combined_worker_agent(payload, None))
+        assert log["status"] == "completed"
+        assert log["slots_proposed"] == 3
+        assert log["kb_matches"] == 0
+
+    def test_missing_credentials_logged_as_failure(self, monkeypatch):
+        """Without Google credentials the agent fails cleanly and plans no reply."""
+        monkeypatch.delenv("GOOGLE_REFRESH_TOKEN", raising=False)
+        payload, log = asyncio.run(
+            agents.admin_scheduling_agent(make_payload("Can we meet?", intents=(Intent.SCHEDULING,)), None)
+        )
+        assert log["status"] == "failed"
+        assert "credentials" in log["error"]
+        assert payload.action_plan == []
+
+
+class TestPipelineAgents:
+    """Ingestion fetches the thread and workers are routed by intent."""
+
+    def test_ingestion_fetches_thread(self, google_credentials):
+        """The Gmail thread is fetched with the shared client into thread_history."""
+        requests = []
+
+        async def run():
+            async with google_client(requests, [gmail_message("m-0", "Earlier message")]) as client:
+                return await agents.ingestion_agent(make_payload("Hello"), client)
+
+        payload, log = asyncio.run(run())
+        assert log == {"agent": "ingestion", "status": "completed", "messages_fetched": 1}
+        assert payload.thread_history.messages[0].body_text == "Earlier message"
+        assert requests[-1].url.path.endswith("/threads/t-1")
+
+    @pytest.mark.parametrize("intents, worker", [
+        ((Intent.SCHEDULING,), "admin_scheduling"),
+        ((Intent.SUPPORT,), "support_faq"),
+        ((Intent.SUPPORT, Intent.SCHEDULING), "combined_worker"),
+    ])
+    def test_routes_to_worker(self, intents, worker, free_calendar, monkeypatch):
+        """Each intent, and the scheduling + support combination, runs its own worker."""
+        monkeypatch.setattr(agents, "semantic_cache", None)
+        log = asyncio.run(orchestrator.run_worker_agent(make_payload("Hello", intents=intents), None))
+        assert log["agent"] == worker
+        assert log["status"] == "completed"
+
+    def test_unhandled_intent_skipped(self):
+        """Intents without a worker are logged as skipped."""
+        log = asyncio.run(orchestrator.run_worker_agent(make_payload("Hello", intents=(Intent.BILLING,)), None))
+        assert log["agent"] == "worker"
+        assert log["status"] == "skipped"
+
+
+class TestRiskScoring:
+    """Risk scores stay in [0, 1] and streaming matches a full rescore."""
+
+    def test_kernel_lower_bound(self):
+        """A confident, short, clean message scores zero."""
+        counts = np.zeros(len(_KEYWORD_WEIGHTS), dtype=np.int64)
+        assert _risk_kernel(1.0, 0, counts, _KEYWORD_WEIGHTS) == 0.0
+
+    def test_kernel_upper_bound(self):
+        """Risk is capped at one however many risky signals add up."""
+        counts = np.full(len(_KEYWORD_WEIGHTS), 100, dtype=np.int64)
+        assert _risk_kernel(0.0, 100_000, counts, _KEYWORD_WEIGHTS) == 1.0
+
+    def test_streaming_matches_full_score(self):
+        """Scoring chunk by chunk gives the same result as scoring the whole draft."""
+        chunks = ["We are disap", "pointed. Our sol", "icitor will be in touch", " urgently.\nRegards"]
+        monitor = StreamingRiskMonitor(0.8)
+        for chunk in chunks:
+            monitor.feed(chunk)
+        text = "".join(chunks)
+        expected = _risk_kernel(0.8, len(text), keyword_counts(text), _KEYWORD_WEIGHTS)
+        assert monitor.finish() == pytest.approx(expected)
+
+    def test_risky_draft_stops_early(self):
+        """A draft that already needs escalation is cancelled, not returned."""
+        payload = make_payload("Hello", confidence=0.2)
+        log = {}
+        chunks = stream("We will take legal action. ", "Our lawyer will sue. ", "Rest of the reply")
+        assert asyncio.run(draft_with_qa(payload, chunks, log)) is None
+        assert log["draft_stopped_early"] is True
+        assert payload.draft_risk_score > 0.7
+
+
+class TestAgentDecorator:
+    """@agent wraps a body's log fields with the agent name and status."""
+
+    def test_completed(self):
+        """A body that returns normally is logged as completed with its fields."""
+        @agent("test_agent")
+        async def body(payload):
+            return {"checked": True}
+
+        payload, log = asyncio.run(body(make_payload("Hello")))
+        assert payload.workflow_id == "wf-1"
+        assert log == {"agent": "test_agent", "status": "completed", "checked": True}
+
+    def test_skipped(self):
+        """A body that returns skipped=True is logged as skipped."""
+        _, log = asyncio.run(agents.admin_scheduling_agent(make_payload("Hello"), None))
+        assert log["status"] == "skipped"
+
+    def test_failed(self):
+        """An exception in the body is recorded instead of propagating."""
+        @agent("test_agent")
+        async def body(payload):
+            raise ValueError("boom")
+
+        _, log = asyncio.run(body(make_payload("Hello")))
+        assert log == {"agent": "test_agent", "status": "failed", "error": "boom"}
+
+
+class TestAutomationEvents:
+    """Automation events are written in order and none are lost at shutdown."""
+
+    def test_writer_flushes_queue_before_exiting(self, capfd):
+        """Everything queued before the queue is closed is written, then the writer exits."""
+        async def run():
+            queue = asyncio.Queue()
+            writer = asyncio.create_task(_drain_automation_events(queue))
+            for i in range(orchestrator.LOG_BATCH_SIZE + 5):
+                queue.put_nowait({"event": i})
+            queue.put_nowait(orchestrator.LOG_QUEUE_CLOSED)
+            await asyncio.wait_for(writer, 5)
+
+        asyncio.run(run())
+        lines = capfd.readouterr().out.splitlines()
+        assert [orjson.loads(line.split(" ", 1)[1])["event"] for line in lines] == list(
+            range(orchestrator.LOG_BATCH_SIZE + 5)
+        )
+
+    def test_events_after_close_written_directly(self, capfd, monkeypatch):
+        """Events logged once the queue is closed are written instead of dropped."""
+        monkeypatch.setattr(orchestrator.app.state, "log_q", None, raising=False)
+        orchestrator.log_automation_event({"workflow_id": "wf-late"})
+        assert '"workflow_id":"wf-late"' in capfd.readouterr().out
+
+
+class RecordingSession:
+    """Database session double that records staged records, commits and rollbacks."""
+
+    def __init__(self, commit_error=None):
+        self.commit_error = commit_error
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def add(self, record):
+        self.added.append(record)
+
+    async def commit(self):
+        if self.commit_error:
+            raise self.commit_error
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class TestHandleIncomingMessage:
+    """Each workflow is committed once, and failures are recorded and reported."""
+
+    REQUEST = {
+        "tenant_id": "tenant-1",
+        "source": {"channel": "gmail", "thread_id": "t-1", "message_id": "m-1"},
+        "contact": {"email": "client@example.com"},
+        "message": {
+            "subject": "Hello",
+            "body_text": "How do I export my data?",
+            "received_at": "2025-01-15T10:30:00Z",
+            "message_id": "m-1",
+            "thread_id": "t-1"
+        }
+    }
+
+    @pytest.fixture
+    def post(self, monkeypatch):
+        """Post the request against a given session, returning the response and logged events."""
+        monkeypatch.delenv("GOOGLE_REFRESH_TOKEN", raising=False)
+        monkeypatch.setattr(agents, "semantic_cache", None)
+        events = []
+        monkeypatch.setattr(orchestrator, "log_automation_event", events.append)
+
+        def post_with(db):
+            async def session():
+                yield db
+
+            orchestrator.app.dependency_overrides[orchestrator.get_db] = session
+            orchestrator.app.dependency_overrides[orchestrator.get_http] = lambda: None
+            try:
+                client = TestClient(orchestrator.app, raise_server_exceptions=False)
+                return client.post("/workflows/incoming-message", json=self.REQUEST), events
+            finally:
+                orchestrator.app.dependency_overrides.clear()
+
+        return post_with
+
+    def test_completed_in_one_commit(self, post):
+        """The record is staged once and committed once with the final state."""
+        db = RecordingSession()
+        response, events = post(db)
+        assert response.status_code == 200
+        assert (len(db.added), db.commits, db.rollbacks) == (1, 1, 0)
+        record = db.added[0]
+        assert record.status == "completed"
+        assert record.payload["workflow_id"] == response.json()["workflow_id"]
+        agent_names = [log["agent"] for log in events[0]["agent_logs"]]
+        assert agent_names[:2] + agent_names[-1:] == ["ingestion", "triage", "qa_guardrail"]
+
+    def test_pipeline_error_recorded_as_failed(self, post, monkeypatch):
+        """Partial state is rolled back and the workflow is committed as failed."""
+        async def broken_guardrail(payload):
+            raise ValueError("guardrail down")
+
+        monkeypatch.setattr(orchestrator, "qa_guardrail_agent", broken_guardrail)
+        db = RecordingSession()
+        response, events = post(db)
+        assert response.status_code == 500
+        assert (db.rollbacks, db.commits) == (1, 1)
+        assert db.added[-1].status == "failed"
+        assert events == [{"workflow_id": db.added[-1].workflow_id, "status": "failed", "error": "guardrail down"}]
+
+    def test_database_error_reported_with_original(self, post):
+        """A failing database is reported alongside the error, not instead of it."""
+        response, events = post(RecordingSession(commit_error=ConnectionError("db down")))
+        assert response.status_code == 500
+        assert response.json()["detail"] == "Workflow processing failed: db down"
+        assert events[0]["error"] == "db down"
+        assert events[0]["record_error"] == "db down"
+
+
+class TestListWorkflows:
+    """Workflows are listed newest first in keyset pages."""
+
+    @pytest.mark.parametrize("limit", [0, -1, orchestrator.MAX_LIST_LIMIT + 1])
+    def test_out_of_range_limit_rejected(self, limit):
+        """Limits outside 1..MAX_LIST_LIMIT are a 422, not a database error."""
+        async def no_db():
+            yield None
+
+        orchestrator.app.dependency_overrides[orchestrator.get_db] = no_db
+        try:
+            response = TestClient(orchestrator.app).get("/workflows", params={"limit": limit})
+        finally:
+            orchestrator.app.dependency_overrides.clear()
+        assert response.status_code == 422
+
+    @pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="needs TEST_DATABASE_URL (Postgres)")
+    def test_pages_cover_rows_sharing_a_timestamp(self, monkeypatch):
+        """Paging on (created_at, workflow_id) returns every row exactly once."""
+        monkeypatch.setattr(orchestrator, "DATABASE_URL", os.environ["TEST_DATABASE_URL"])
+        tied = datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+        rows = [("wf-a", tied), ("wf-b", tied), ("wf-c", tied), ("wf-d", tied - timedelta(hours=1))]
+
+        async def seed():
+            async with orchestrator.app.state.sessionmaker() as db:
+                await db.execute(orchestrator.WorkflowRecord.__table__.delete())
+                db.add_all(
+                    orchestrator.WorkflowRecord(
+                        workflow_id=workflow_id,
+                        tenant_id="tenant-1",
+                        payload={},
+                        created_at=created_at,
+                        updated_at=created_at,
+                        status="completed"
+                    )
+                    for workflow_id, created_at in rows
+                )
+                await db.commit()
+
+        with TestClient(orchestrator.app) as client:
+            client.portal.call(seed)
+            params = {"tenant_id": "tenant-1", "limit": 2}
+            seen = []
+            while True:
+                page = client.get("/workflows", params=params).json()
+                seen += [workflow["workflow_id"] for workflow in page["workflows"]]
+                if page["next_before"] is None:
+                    break
+                params.update(before=page["next_before"], before_id=page["next_before_id"])
+
+        assert seen == ["wf-c", "wf-b", "wf-a", "wf-d"]
@@ -0,0 +1,99 @@
+"""Rule-based triage for unambiguous messages
+
+Auto-replies, unsubscribe requests and clear scheduling or billing
+requests can be classified from keywords alone. All rules are combined
+into one alternation compiled at import, so a message is scanned in a
+single pass and the LLM is only called when no rule decides. A scheduling
+hit does not decide when the message also asks a question no rule covers
+("can we book a call? also how do I export X"), since the reply has to
+answer that too.
+"""
+
+from typing import List, NamedTuple, Optional
+import re
+
+from schemas import Classification, Intent, Priority
+
+
+class TriageRule(NamedTuple):
+    pattern: str  # regex; use (?:...) groups only
+    intent: Intent
+    priority: Priority = Priority.NORMAL
+
+
+# Confidence assigned when rules alone decide the classification
+RULE_CONFIDENCE = 0.95
+
+TRIAGE_RULES: List[TriageRule] = [
+    # Auto-replies and list mail
+    TriageRule(r"\bout of (?:the )?office\b", Intent.OTHER, Priority.LOW),
+    TriageRule(r"\bautomatic reply\b|\bauto-?reply\b", Intent.OTHER, Priority.LOW),
+    TriageRule(r"\bdelivery status notification\b|\bundeliverable\b", Intent.OTHER, Priority.LOW),
+    TriageRule(r"\bunsubscribe\b", Intent.OTHER, Priority.LOW),
+
+    # Scheduling
+    TriageRule(
+        r"\b(?:book|schedule|arrange|set up)\s+(?:a|an|the)?\s*(?:call|meeting|demo|chat)\b",
+        Intent.SCHEDULING
+    ),
+    TriageRule(r"\breschedul(?:e|ing)\b", Intent.SCHEDULING),
+    TriageRule(r"\b(?:calendar|meeting) invite\b", Intent.SCHEDULING),
+
+    # Billing
+    TriageRule(r"\brefund\b", Intent.BILLING, Priority.HIGH),
+    TriageRule(r"\binvoice\b", Intent.BILLING),
+]
+
+_RULES_RE = re.compile(
+    "|".join(f"(?P<r{i}>{rule.pattern})" for i, rule in enumerate(TRIAGE_RULES)),
+    re.IGNORECASE
+)
+
+_PRIORITY_RANK = {priority: rank for rank, priority in enumerate(Priority)}
+
+# Sentence-ish segments, and cues that a segment asks something
+_SEGMENT_RE = re.compile(r"[^.!?\n]*[.!?]*")
+_QUESTION_RE = re.compile(
+    r"\?|\b(?:how|what|why|where|which|is there|are there|does|do you|can i)\b",
+    re.IGNORECASE
+)
+
+
+def match_rules(text: str) -> List[TriageRule]:
+    """Return every rule matching text, in order of appearance"""
+    return [TRIAGE_RULES[int(m.lastgroup[1:])] for m in _RULES_RE.finditer(text)]
+
+
+def has_unmatched_question(text: str) -> bool:
+    """Return True if some segment of text asks a question that no rule matches"""
+    return any(
+        _QUESTION_RE.search(segment) and not _RULES_RE.search(segment)
+        for segment in _SEGMENT_RE.findall(text)
+    )
+
+
+def classify_by_rules(subject: str, body_text: str) -> Optional[Classification]:
+    """
+    Classify a message from keyword rules.
+
+    Args:
+        subject: Message subject
+        body_text: Plain-text message body
+
+    Returns:
+        Classification when all matching rules agree on one intent,
+        otherwise None (no match, conflicting intents, or a scheduling
+        request alongside a question the rules do not cover)
+    """
+    text = f"{subject}\n{body_text}"
+    matched = match_rules(text)
+    if len({rule.intent for rule in matched}) != 1:
+        return None
+    if matched[0].intent == Intent.SCHEDULING and has_unmatched_question(text):
+        return None
+
+    return Classification(
+        intent=matched[0].intent,
+        priority=min((rule.priority for rule in matched), key=_PRIORITY_RANK.get),
+        confidence=RULE_CONFIDENCE
+    )